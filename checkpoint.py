@@ -0,0 +1,56 @@
+"""Persist each pipeline stage's output so a failed run can be resumed."""
+
+import json
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import config
+
+# Pipeline stages in execution order
+STAGES = ("fetch", "prompt", "summary", "delivery")
+
+
+def json_default(obj):
+    """`json.dumps` hook for the non-JSON types fetchers return."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Not serializable: {type(obj)}")
+
+
+class RunCheckpoint:
+    """Stage outputs for one run, stored as JSON files under RUNS_DIR/<date>/."""
+
+    def __init__(self, run_date: str | None = None, root: str | None = None):
+        if run_date is None:
+            run_date = datetime.now(ZoneInfo(config.TIMEZONE)).strftime("%Y-%m-%d")
+        self.run_date = run_date
+        self.dir = os.path.join(root or config.RUNS_DIR, run_date)
+
+    def _path(self, stage: str) -> str:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        return os.path.join(self.dir, f"{stage}.json")
+
+    def has(self, stage: str) -> bool:
+        return os.path.exists(self._path(stage))
+
+    def load(self, stage: str):
+        with open(self._path(stage), encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, stage: str, data):
+        """Write a stage's output atomically (write-then-rename)."""
+        os.makedirs(self.dir, exist_ok=True)
+        path = self._path(stage)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=json_default, indent=2)
+        os.replace(tmp, path)
+
+    def reset(self, from_stage: str = STAGES[0]):
+        """Discard `from_stage` and every stage after it."""
+        for stage in STAGES[STAGES.index(from_stage):]:
+            path = self._path(stage)
+            if os.path.exists(path):
+                os.remove(path)
@@ -8,10 +8,46 @@ OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 LOCATION_LAT = os.getenv("LOCATION_LAT", "37.2296")
 LOCATION_LON = os.getenv("LOCATION_LON", "-80.4139")
 LOCATION_NAME = os.getenv("LOCATION_NAME", "Blacksburg, VA")
+# Set to use the One Call 3.0 endpoint (requires a separate OWM subscription)
+OPENWEATHER_ONECALL = os.getenv("OPENWEATHER_ONECALL", "").lower() in ("1", "true", "yes")
+
+
+def _parse_locations(raw: str | None) -> list[dict]:
+    """Parse "Name:lat,lon;Name:lat,lon" into a list of location dicts.
+
+    Malformed entries are skipped with a warning; if none are usable this
+    falls back to the single LOCATION_* location.
+    """
+    locations = []
+    for item in (raw or "").split(";"):
+        if not item.strip():
+            continue
+        name, _, coords = item.rpartition(":")
+        try:
+            lat, lon = (float(c) for c in coords.split(","))
+        except ValueError:
+            print(f"Warning: ignoring malformed WEATHER_LOCATIONS entry {item!r} "
+                  "(expected Name:lat,lon)")
+            continue
+        locations.append({"name": name.strip() or f"{lat},{lon}", "lat": lat, "lon": lon})
+    return locations or [{"name": LOCATION_NAME, "lat": LOCATION_LAT, "lon": LOCATION_LON}]
+
+
+# Extra locations for commuters, e.g. "Home:37.2296,-80.4139;Campus:37.2284,-80.4234".
+# Defaults to the single LOCATION_* above.
+WEATHER_LOCATIONS = _parse_locations(os.getenv("WEATHER_LOCATIONS"))
 
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+# Comma-separated list of chat IDs for multi-recipient runs
+TELEGRAM_CHAT_IDS = [
+    c.strip() for c in (TELEGRAM_CHAT_ID or "").split(",") if c.strip()
+]
+# Undelivered messages are persisted here and retried on the next run
+TELEGRAM_OUTBOX_PATH = os.getenv("TELEGRAM_OUTBOX_PATH", ".telegram_outbox.json")
+# Outbox entries older than this are discarded instead of sent late
+TELEGRAM_OUTBOX_MAX_AGE_HOURS = float(os.getenv("TELEGRAM_OUTBOX_MAX_AGE_HOURS", "12"))
 
 # Outlook (IMAP)
 OUTLOOK_EMAIL = os.getenv("OUTLOOK_EMAIL")
@@ -35,3 +71,6 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
 # Timezone
 TIMEZONE = os.getenv("TIMEZONE", "America/New_York")
+
+# Per-run checkpoints (one subdirectory per date) for `main.py --resume`
+RUNS_DIR = os.getenv("RUNS_DIR", "runs")
@@ -1,74 +1,173 @@
+"""Fetch current weather and today's forecast from OpenWeatherMap."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
 import requests
 import config
 
+OWM_BASE = "https://api.openweathermap.org/data"
+
+# Results are shared by every caller asking for the same spot
+CACHE_TTL = 600  # seconds
+_cache: dict[tuple[float, float], tuple[float, dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_key(lat, lon) -> tuple[float, float]:
+    # 3 decimal places is ~100 m, so locations configured with slightly
+    # different precision (37.2296 vs 37.22961) still share one fetch
+    return round(float(lat), 3), round(float(lon), 3)
+
+
+def _get(url: str, params: dict) -> dict:
+    resp = requests.get(url, params=params, timeout=10)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _today_only(entries: list[dict], tz: ZoneInfo) -> list[dict]:
+    """Keep forecast entries that fall on the local calendar day."""
+    today = datetime.now(tz).date()
+    return [e for e in entries if datetime.fromtimestamp(e["dt"], tz).date() == today]
+
+
+def _summarize(current_temp: float, condition: str, temps: list[float],
+               pops: list[float]) -> dict:
+    temps = temps + [current_temp]
+    return {
+        "current_temp": round(current_temp),
+        "high": round(max(temps)),
+        "low": round(min(temps)),
+        "condition": condition.title(),
+        # pop = probability of precipitation, 0-1
+        "rain_chance": round(max(pops) * 100) if pops else 0,
+    }
+
+
+def _fetch_onecall(lat, lon, api_key: str, tz: ZoneInfo) -> dict:
+    """Current conditions and hourly forecast in a single One Call 3.0 request."""
+    data = _get(f"{OWM_BASE}/3.0/onecall", {
+        "lat": lat,
+        "lon": lon,
+        "appid": api_key,
+        "units": "imperial",
+        "exclude": "minutely,daily,alerts",
+    })
+    hourly = _today_only(data.get("hourly", []), tz)
+    return _summarize(
+        data["current"]["temp"],
+        data["current"]["weather"][0]["description"],
+        [h["temp"] for h in hourly],
+        [h.get("pop", 0) for h in hourly],
+    )
+
 
-def fetch_weather() -> dict:
-    """Fetch current weather and forecast from OpenWeatherMap.
+def _fetch_free_tier(lat, lon, api_key: str, tz: ZoneInfo) -> dict:
+    """Free-tier /weather and /forecast, requested concurrently."""
+    params = {"lat": lat, "lon": lon, "appid": api_key, "units": "imperial"}
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        current_future = pool.submit(_get, f"{OWM_BASE}/2.5/weather", params)
+        # 3-hour blocks; 8 of them always reach past local midnight
+        forecast_future = pool.submit(
+            _get, f"{OWM_BASE}/2.5/forecast", {**params, "cnt": 8}
+        )
+        current = current_future.result()
+        forecast = forecast_future.result()
 
-    Uses the free-tier /weather and /forecast endpoints to get:
-    - Current temp and conditions
-    - Today's high/low
-    - Precipitation chance
+    today = _today_only(forecast["list"], tz)
+    return _summarize(
+        current["main"]["temp"],
+        current["weather"][0]["description"],
+        [e["main"]["temp"] for e in today],
+        [e.get("pop", 0) for e in today],
+    )
+
+
+def fetch_weather(lat=None, lon=None) -> dict:
+    """Fetch current weather and today's forecast for one location.
+
+    Returns current temp, conditions, and the high/low and max precipitation
+    chance for the rest of the local calendar day (config.TIMEZONE).
+    Defaults to LOCATION_LAT/LOCATION_LON. Results are cached per location
+    for CACHE_TTL seconds.
     """
     api_key = config.OPENWEATHER_API_KEY
-    lat = config.LOCATION_LAT
-    lon = config.LOCATION_LON
+    lat = config.LOCATION_LAT if lat is None else lat
+    lon = config.LOCATION_LON if lon is None else lon
 
     if not api_key:
         return {"error": "OPENWEATHER_API_KEY not set"}
 
     try:
-        # Current weather
-        current_url = "https://api.openweathermap.org/data/2.5/weather"
-        current_resp = requests.get(current_url, params={
-            "lat": lat,
-            "lon": lon,
-            "appid": api_key,
-            "units": "imperial",
-        }, timeout=10)
-        current_resp.raise_for_status()
-        current = current_resp.json()
-
-        # 5-day/3-hour forecast (to extract today's high/low and rain chance)
-        forecast_url = "https://api.openweathermap.org/data/2.5/forecast"
-        forecast_resp = requests.get(forecast_url, params={
-            "lat": lat,
-            "lon": lon,
-            "appid": api_key,
-            "units": "imperial",
-            "cnt": 8,  # next 24 hours (8 x 3-hour blocks)
-        }, timeout=10)
-        forecast_resp.raise_for_status()
-        forecast = forecast_resp.json()
+        key = _cache_key(lat, lon)
+    except ValueError:
+        return {"error": f"Invalid coordinates: {lat}, {lon}"}
+
+    with _cache_lock:
+        hit = _cache.get(key)
+    if hit and time.monotonic() - hit[0] < CACHE_TTL:
+        return dict(hit[1])
+
+    tz = ZoneInfo(config.TIMEZONE)
+    fetch = _fetch_onecall if config.OPENWEATHER_ONECALL else _fetch_free_tier
+    try:
+        data = fetch(lat, lon, api_key, tz)
     except requests.RequestException as e:
         return {"error": str(e)}
 
-    # Parse forecast for high/low and max precipitation probability
-    temps = [entry["main"]["temp"] for entry in forecast["list"]]
-    temps.append(current["main"]["temp"])
-    high = round(max(temps))
-    low = round(min(temps))
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), data)
+    return dict(data)
 
-    # Precipitation probability (pop = probability of precipitation, 0-1)
-    rain_chances = [entry.get("pop", 0) for entry in forecast["list"]]
-    max_rain = round(max(rain_chances) * 100) if rain_chances else 0
 
-    return {
-        "current_temp": round(current["main"]["temp"]),
-        "high": high,
-        "low": low,
-        "condition": current["weather"][0]["description"].title(),
-        "rain_chance": max_rain,
-    }
+def fetch_weather_locations(locations: list[dict] | None = None) -> list[dict]:
+    """Fetch weather for several locations concurrently.
+
+    `locations` is a list of {"name", "lat", "lon"} dicts (defaults to
+    config.WEATHER_LOCATIONS). Locations that round to the same cache key
+    are fetched once.
+    """
+    locations = locations or config.WEATHER_LOCATIONS or [{
+        "name": config.LOCATION_NAME,
+        "lat": config.LOCATION_LAT,
+        "lon": config.LOCATION_LON,
+    }]
+
+    def _key(loc):
+        try:
+            return _cache_key(loc["lat"], loc["lon"])
+        except ValueError:
+            # Unparseable coordinates: fetch_weather reports the error
+            return (loc["lat"], loc["lon"])
+
+    unique = {}
+    for loc in locations:
+        unique.setdefault(_key(loc), loc)
+
+    with ThreadPoolExecutor(max_workers=min(8, len(unique))) as pool:
+        futures = {
+            key: pool.submit(fetch_weather, loc["lat"], loc["lon"])
+            for key, loc in unique.items()
+        }
+        results = {key: f.result() for key, f in futures.items()}
+
+    return [{"location": loc["name"], **results[_key(loc)]} for loc in locations]
 
 
 def format_weather(data: dict) -> str:
     """Format weather data into a briefing-friendly string."""
+    suffix = f" — {data['location']}" if "location" in data else ""
     if "error" in data:
-        return f"⚠️ Weather unavailable: {data['error']}"
+        return f"⚠️ Weather unavailable{suffix}: {data['error']}"
+
+    header = f"🌤 WEATHER{suffix}"
 
     return (
-        f"🌤 WEATHER\n"
+        f"{header}\n"
         f"{data['low']}°F → {data['high']}°F, {data['condition'].lower()}, "
         f"{data['rain_chance']}% rain"
     )
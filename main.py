@@ -1,30 +1,181 @@
 """VT Morning Briefing — AI-summarized daily digest."""
 
-from fetchers.weather import fetch_weather
+import argparse
+
+import config
+from fetchers.weather import fetch_weather_locations
 from fetchers.gmail import fetch_emails
 from fetchers.canvas import fetch_canvas_assignments
-from summarizer import summarize
-from messenger import send_telegram
+from summarizer import build_prompt, summarize_prompt
+from messenger import DeliveryError, DeliveryQueue, split_message
+from checkpoint import STAGES, RunCheckpoint
+
+
+# Source name -> fetcher, in the order they run
+FETCHERS = {
+    "weather": fetch_weather_locations,
+    "emails": fetch_emails,
+    "canvas": fetch_canvas_assignments,
+}
+
+
+def _has_error(result) -> bool:
+    """True if a fetcher result is (or contains) an error payload."""
+    items = result if isinstance(result, list) else [result]
+    return any(isinstance(item, dict) and "error" in item for item in items)
+
+
+def build_briefing(run: RunCheckpoint, refetch_errors: bool = False) -> str:
+    """Fetch all data sources and produce an AI-summarized briefing.
+
+    Each stage is loaded from `run` if already checkpointed, otherwise
+    computed and saved. With `refetch_errors`, sources whose checkpointed
+    result is an error payload are fetched again.
+    """
+    if run.has("summary"):
+        print("Using checkpointed summary.")
+        return run.load("summary")
+
+    raw = run.load("fetch") if run.has("fetch") else {}
+    stale = [
+        name for name in FETCHERS
+        if name not in raw or (refetch_errors and _has_error(raw[name]))
+    ]
+    if stale:
+        if raw:
+            print(f"Re-fetching: {', '.join(stale)}")
+        for name in stale:
+            raw[name] = FETCHERS[name]()
+        run.save("fetch", raw)
+        # The prompt was built from the old data
+        run.reset("prompt")
+    else:
+        print("Using checkpointed fetcher results.")
+
+    if run.has("prompt"):
+        prompt = run.load("prompt")
+    else:
+        prompt = build_prompt(raw["weather"], raw["emails"], raw["canvas"])
+        run.save("prompt", prompt)
+
+    message = summarize_prompt(prompt)
+    run.save("summary", message)
+    return message
+
+
+def deliver(run: RunCheckpoint, message: str):
+    """Queue the briefing for Telegram and flush the outbox.
 
+    The delivery checkpoint records the message ID of every chunk as it is
+    sent, per chat. A resumed run only queues the chunks a recipient is
+    still missing and that aren't already in the outbox.
+    """
+    status = run.load("delivery") if run.has("delivery") else {}
+    if status.get("state") == "delivered":
+        print("Briefing already delivered for this run.")
+        return
 
-def build_briefing() -> str:
-    """Fetch all data sources and produce an AI-summarized briefing."""
-    weather = fetch_weather()
-    emails = fetch_emails()
-    canvas = fetch_canvas_assignments()
+    chat_ids = config.TELEGRAM_CHAT_IDS
+    if not chat_ids:
+        raise ValueError("No Telegram recipients: set TELEGRAM_CHAT_ID")
 
-    return summarize(weather, emails, canvas)
+    parts = len(split_message(message))
+    # chat_id -> {part number (str): Telegram message_id}
+    sent = status.get("sent", {})
+
+    def _missing(chat_id) -> set[int]:
+        return {p for p in range(1, parts + 1) if str(p) not in sent.get(chat_id, {})}
+
+    def _save(state, **extra):
+        run.save("delivery", {"state": state, "parts": parts, "sent": sent, **extra})
+
+    def _record(entry, msg):
+        if entry.get("run_id") == run.run_date:
+            sent.setdefault(entry["chat_id"], {})[str(entry["part"])] = msg["message_id"]
+            _save("sending")
+
+    queue = DeliveryQueue()
+    queued = queue.queued_parts(run.run_date)
+    if queued:
+        print(f"Resuming {len(queued)} queued chunk(s) for this run...")
+    earlier = len(queue.pending) - len(queued)
+    if earlier:
+        print(f"Retrying {earlier} undelivered message(s) from a previous run...")
+    for chat_id in chat_ids:
+        needed = {p for p in _missing(chat_id) if (chat_id, p) not in queued}
+        if needed:
+            queue.enqueue(message, [chat_id], run_id=run.run_date, parts=needed)
+    _save("sending")
+
+    print("Sending Telegram message...")
+    try:
+        queue.flush(on_sent=_record)
+    except DeliveryError as e:
+        ours = [f for f in e.failed if f.get("run_id") == run.run_date]
+        if ours:
+            # Rejected chunks are gone from the outbox; --resume re-queues
+            # them for the affected chats only
+            _save("failed", error=str(e))
+            raise
+        print(f"Warning: dropped messages from a previous run: {e}")
+
+    total = sum(len(p) for p in sent.values())
+    print(f"Telegram messages sent for this run: {total}")
+    left = {chat_id: sorted(_missing(chat_id)) for chat_id in chat_ids if _missing(chat_id)}
+    if left:
+        print(f"Undelivered parts: {left}; rerun with --resume to retry.")
+        _save("pending")
+    else:
+        _save("delivered")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="reuse today's checkpointed stages, re-fetching sources that errored",
+    )
+    parser.add_argument(
+        "--rerun", choices=STAGES, metavar="STAGE",
+        help=(f"reuse today's checkpoints but redo STAGE and everything after it "
+              f"({', '.join(STAGES)}); drops this run's queued chunks"),
+    )
+    parser.add_argument(
+        "--no-send", action="store_true",
+        help="stop after the summary stage without delivering",
+    )
+    parser.add_argument(
+        "--date", help="run directory to use (YYYY-MM-DD, default: today)",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    run = RunCheckpoint(args.date)
+
+    if args.rerun:
+        # The rerun produces a new briefing; don't let old chunks go out
+        dropped = DeliveryQueue().discard_run(run.run_date)
+        if dropped:
+            print(f"Discarded {dropped} queued chunk(s) from the earlier briefing.")
+        run.reset(args.rerun)
+    elif not args.resume:
+        if DeliveryQueue().has_run(run.run_date):
+            raise SystemExit(
+                "Today's briefing still has undelivered chunks in the outbox. "
+                "Use --resume to deliver them, or --rerun fetch to replace them."
+            )
+        run.reset()
+    print(f"Run directory: {run.dir}")
+
     print("Building morning briefing...")
-    message = build_briefing()
+    message = build_briefing(run, refetch_errors=args.resume and not args.rerun)
     print(f"\n--- Briefing ---\n{message}\n--- End ---\n")
 
-    print("Sending Telegram message...")
-    result = send_telegram(message)
-    msg_id = result["result"]["message_id"]
-    print(f"Telegram message sent! ID: {msg_id}")
+    if args.no_send:
+        return
+    deliver(run, message)
 
 
 if __name__ == "__main__":
@@ -1,15 +1,56 @@
+"""Deliver briefings via the Telegram Bot API.
+
+Messages go through a small on-disk outbox so that a crash or network
+failure after summarization only costs a redelivery, not a rerun of the
+fetch and LLM stages.
+"""
+
 import json
+import os
+import threading
+import time
 import urllib.request
 import urllib.error
+from datetime import datetime, timedelta
 
 import config
 
+# Telegram rejects messages longer than this, counted in UTF-16 code units
+TELEGRAM_MAX_CHARS = 4096
+
+# Telegram's documented limits: ~1 msg/sec per chat, ~30 msg/sec overall
+PER_CHAT_RATE = 1.0
+GLOBAL_RATE = 30.0
+
+REQUEST_TIMEOUT = 10
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+class DeliveryError(Exception):
+    """A Telegram send failed. `retryable` is False for permanent rejections.
 
-def send_telegram(body: str) -> dict:
-    """Send a message via Telegram Bot API. Returns the API response."""
+    When raised by `DeliveryQueue.flush`, `sent` holds the messages that did
+    go out and `failed` the outbox entries that were dropped.
+    """
+
+    def __init__(self, message: str, retryable: bool = True,
+                 sent: list[dict] | None = None, failed: list[dict] | None = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.sent = sent or []
+        self.failed = failed or []
+
+
+def send_telegram(body: str, chat_id: str | None = None) -> dict:
+    """Send a single message via Telegram Bot API. Returns the API response.
+
+    Makes exactly one attempt; use `DeliveryQueue` for chunking and retries.
+    """
     url = f"https://api.telegram.org/bot{config.TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = json.dumps({
-        "chat_id": config.TELEGRAM_CHAT_ID,
+        "chat_id": chat_id or config.TELEGRAM_CHAT_ID,
         "text": body,
     }).encode("utf-8")
 
@@ -19,5 +60,299 @@ def send_telegram(body: str) -> dict:
         headers={"Content-Type": "application/json"},
     )
 
-    with urllib.request.urlopen(req) as resp:
+    with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as resp:
         return json.loads(resp.read().decode("utf-8"))
+
+
+def _tg_len(text: str) -> int:
+    """Length as Telegram counts it: UTF-16 code units, not code points."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _hard_cut(text: str, limit: int) -> list[str]:
+    """Cut `text` into pieces of at most `limit` UTF-16 units, never mid-character."""
+    pieces = []
+    current = []
+    size = 0
+    for ch in text:
+        width = _tg_len(ch)
+        if size + width > limit:
+            pieces.append("".join(current))
+            current = []
+            size = 0
+        current.append(ch)
+        size += width
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def split_message(body: str, limit: int = TELEGRAM_MAX_CHARS) -> list[str]:
+    """Split a briefing into chunks of at most `limit` UTF-16 code units.
+
+    Prefers section boundaries (blank lines), then line breaks, and only
+    hard-cuts text when a single line is longer than the limit.
+    """
+    if _tg_len(body) <= limit:
+        return [body]
+
+    def _pieces(text: str, sep: str, finer: str | None) -> list[str]:
+        out = []
+        for part in text.split(sep):
+            if _tg_len(part) <= limit:
+                out.append(part)
+            elif finer is not None:
+                out.extend(_pack(_pieces(part, finer, None), finer))
+            else:
+                out.extend(_hard_cut(part, limit))
+        return out
+
+    def _pack(parts: list[str], sep: str) -> list[str]:
+        chunks = []
+        current = ""
+        for part in parts:
+            candidate = f"{current}{sep}{part}" if current else part
+            if _tg_len(candidate) <= limit:
+                current = candidate
+            else:
+                if current:
+                    chunks.append(current)
+                current = part
+        if current:
+            chunks.append(current)
+        return chunks
+
+    chunks = _pack(_pieces(body, "\n\n", "\n"), "\n\n")
+    return [c.strip("\n") for c in chunks if c.strip()]
+
+
+class _TokenBucket:
+    """Blocking token bucket: `rate` tokens/sec, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_delay(err: urllib.error.HTTPError) -> float | None:
+    """Return how long to wait before retrying, or None if not retryable.
+
+    Telegram's own retry_after is returned as-is; the caller decides whether
+    it is worth waiting that long.
+    """
+    if err.code == 429:
+        try:
+            body = json.loads(err.read().decode("utf-8"))
+            return float(body["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            return BACKOFF_BASE
+    if err.code >= 500:
+        return 0.0
+    return None
+
+
+def _send_with_retry(text: str, chat_id: str) -> dict:
+    """Send one chunk, retrying 429s, 5xx and network errors with backoff."""
+    last_error = None
+    for attempt in range(MAX_ATTEMPTS):
+        backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+        try:
+            resp = send_telegram(text, chat_id)
+            if not isinstance(resp, dict) or "result" not in resp:
+                raise ValueError(f"unexpected Telegram response: {resp!r}")
+            return resp
+        except urllib.error.HTTPError as e:
+            delay = _retry_delay(e)
+            if delay is None:
+                raise DeliveryError(f"Telegram rejected message: HTTP {e.code}",
+                                    retryable=False) from e
+            last_error = e
+            if delay > BACKOFF_MAX:
+                # Don't hold the whole run hostage; the chunk stays in the outbox
+                last_error = f"{e} (retry_after {delay:.0f}s exceeds {BACKOFF_MAX:.0f}s)"
+                break
+        except (urllib.error.URLError, TimeoutError, OSError, ValueError) as e:
+            # ValueError covers non-JSON bodies, e.g. from a proxy
+            delay = 0.0
+            last_error = e
+        if attempt < MAX_ATTEMPTS - 1:
+            # Honour Telegram's retry_after, otherwise back off exponentially
+            time.sleep(delay or backoff)
+    raise DeliveryError(f"Giving up after {attempt + 1} attempt(s): {last_error}")
+
+
+class DeliveryQueue:
+    """Persistent outbox of Telegram messages, flushed in order per chat.
+
+    Each entry is one chunk for one chat. Entries are removed from disk only
+    after Telegram accepts them, so anything left over is retried next run.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or config.TELEGRAM_OUTBOX_PATH
+        self.pending = self._load()
+        self._global_bucket = _TokenBucket(GLOBAL_RATE, capacity=GLOBAL_RATE)
+        self._chat_buckets: dict[str, _TokenBucket] = {}
+
+    def _load(self) -> list[dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read outbox {self.path}: {e}")
+            return []
+
+        # Don't send yesterday's briefing ahead of today's
+        cutoff = datetime.now() - timedelta(hours=config.TELEGRAM_OUTBOX_MAX_AGE_HOURS)
+        fresh = []
+        stale = 0
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                if not {"chat_id", "text", "queued_at"} <= entry.keys():
+                    raise ValueError("missing fields")
+                queued_at = datetime.fromisoformat(entry["queued_at"])
+            except (AttributeError, TypeError, ValueError) as e:
+                print(f"Warning: skipping malformed outbox entry in {self.path}: {e}")
+                continue
+            if queued_at < cutoff:
+                stale += 1
+            else:
+                fresh.append(entry)
+        if stale:
+            print(f"Discarding {stale} stale message(s) from outbox.")
+        return fresh
+
+    def _save(self):
+        if not self.pending:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        # Write-then-rename so a crash mid-write never corrupts the outbox
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.pending, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def has_run(self, run_id: str) -> bool:
+        """True if the outbox still holds chunks queued for `run_id`."""
+        return any(e.get("run_id") == run_id for e in self.pending)
+
+    def queued_parts(self, run_id: str) -> set[tuple[str, int]]:
+        """(chat_id, part) pairs still in the outbox for `run_id`."""
+        return {
+            (e["chat_id"], e.get("part")) for e in self.pending
+            if e.get("run_id") == run_id
+        }
+
+    def discard_run(self, run_id: str) -> int:
+        """Drop every queued chunk for `run_id`. Returns how many were dropped."""
+        before = len(self.pending)
+        self.pending = [e for e in self.pending if e.get("run_id") != run_id]
+        self._save()
+        return before - len(self.pending)
+
+    def enqueue(self, body: str, chat_ids: list[str] | None = None,
+                run_id: str | None = None, parts: set[int] | None = None):
+        """Split `body` into chunks and queue them for every recipient.
+
+        `run_id` tags the entries so a resumed run can tell its own briefing
+        is already queued. `parts` limits queueing to those 1-based chunk
+        numbers, for re-sending only what a recipient is missing.
+        """
+        chat_ids = chat_ids or config.TELEGRAM_CHAT_IDS
+        if not chat_ids:
+            raise ValueError("No Telegram recipients: set TELEGRAM_CHAT_ID")
+        if not body.strip():
+            raise ValueError("Refusing to queue an empty message")
+        queued_at = datetime.now().isoformat()
+        chunks = split_message(body)
+        for chat_id in chat_ids:
+            for i, chunk in enumerate(chunks):
+                if parts is not None and i + 1 not in parts:
+                    continue
+                self.pending.append({
+                    "chat_id": chat_id,
+                    "text": chunk,
+                    "part": i + 1,
+                    "parts": len(chunks),
+                    "queued_at": queued_at,
+                    "run_id": run_id,
+                })
+        self._save()
+
+    def flush(self, on_sent=None) -> list[dict]:
+        """Send everything in the outbox. Returns the sent Telegram messages.
+
+        `on_sent(entry, message)` is called after each chunk is accepted,
+        so callers can record progress as it happens.
+
+        If a chunk can't be delivered, later chunks for the same chat stay
+        queued so recipients never see parts out of order. If a chunk is
+        permanently rejected, the rest of that message for the chat is
+        dropped with it and `DeliveryError` is raised once the outbox has
+        been worked through.
+        """
+        sent = []
+        failed = []
+        blocked = set()
+        for entry in list(self.pending):
+            chat_id = entry["chat_id"]
+            if chat_id in blocked or entry not in self.pending:
+                continue
+
+            bucket = self._chat_buckets.setdefault(
+                chat_id, _TokenBucket(PER_CHAT_RATE)
+            )
+            bucket.acquire()
+            self._global_bucket.acquire()
+
+            try:
+                result = _send_with_retry(entry["text"], chat_id)
+            except DeliveryError as e:
+                print(f"Telegram delivery to {chat_id} failed: {e}")
+                blocked.add(chat_id)
+                if not e.retryable:
+                    # Retrying won't help (bad token, chat not found, ...)
+                    dropped = [
+                        p for p in self.pending
+                        if p["chat_id"] == chat_id and p["queued_at"] == entry["queued_at"]
+                    ]
+                    for p in dropped:
+                        self.pending.remove(p)
+                        failed.append({**p, "error": str(e)})
+                    self._save()
+                continue
+
+            sent.append(result["result"])
+            self.pending.remove(entry)
+            self._save()
+            if on_sent is not None:
+                on_sent(entry, result["result"])
+
+        if failed:
+            chats = sorted({f["chat_id"] for f in failed})
+            raise DeliveryError(
+                f"{len(failed)} message(s) permanently rejected for chat(s) "
+                f"{', '.join(chats)}: {failed[0]['error']}",
+                retryable=False, sent=sent, failed=failed,
+            )
+        return sent
@@ -6,22 +6,17 @@ from datetime import datetime
 import anthropic
 
 import config
+from checkpoint import json_default
 
 
 def _serialize_data(weather, emails, canvas) -> str:
     """Convert raw fetcher outputs to a JSON string for the prompt."""
-
-    def _default(obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        raise TypeError(f"Not serializable: {type(obj)}")
-
     blob = {
         "weather": weather,
         "gmail": emails,
         "canvas": canvas,
     }
-    return json.dumps(blob, default=_default, indent=2)
+    return json.dumps(blob, default=json_default, indent=2)
 
 
 SYSTEM_PROMPT = (
@@ -38,7 +33,7 @@ SYSTEM_PROMPT = (
     "- Do NOT use Markdown formatting (no bold, italic, links). Plain text only.\n\n"
     "FORMAT (use exactly this structure):\n\n"
     "WEATHER\n"
-    "One line. Temp range, conditions, what to wear.\n\n"
+    "One line per location. Temp range, conditions, what to wear.\n\n"
     "URGENT (only include this section if something is due today)\n"
     "Just the items. No fluff.\n\n"
     "EMAILS\n"
@@ -54,10 +49,18 @@ SYSTEM_PROMPT = (
 )
 
 
-def summarize(weather, emails, canvas) -> str:
-    """Call Claude to summarize raw briefing data into a Telegram-ready message."""
+def build_prompt(weather, emails, canvas) -> str:
+    """Build the user message sent to Claude from raw fetcher outputs."""
     raw = _serialize_data(weather, emails, canvas)
+    return (
+        f"Today is {datetime.now().strftime('%A, %B %d, %Y')}. "
+        f"Here is the raw briefing data:\n\n{raw}\n\n"
+        "Write the morning briefing now."
+    )
 
+
+def summarize_prompt(prompt: str) -> str:
+    """Call Claude with a prebuilt user prompt and return the briefing text."""
     client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
 
     response = client.messages.create(
@@ -67,13 +70,14 @@ def summarize(weather, emails, canvas) -> str:
         messages=[
             {
                 "role": "user",
-                "content": (
-                    f"Today is {datetime.now().strftime('%A, %B %d, %Y')}. "
-                    f"Here is the raw briefing data:\n\n{raw}\n\n"
-                    "Write the morning briefing now."
-                ),
+                "content": prompt,
             }
         ],
     )
 
     return response.content[0].text
+
+
+def summarize(weather, emails, canvas) -> str:
+    """Call Claude to summarize raw briefing data into a Telegram-ready message."""
+    return summarize_prompt(build_prompt(weather, emails, canvas))